@@ -1,45 +1,97 @@
+import csv
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
 
 import numpy as np
-import pandas as pd
 from ska_ost_array_config.array_config import LowSubArray
 
+try:
+    from numba import njit, prange
 
-def apply_rotation(low_array_file: str, station_name: str) -> tuple[np.ndarray, float]:
-    low_array_data = pd.read_csv(low_array_file, skiprows=21)
-    s81_spec = low_array_data[low_array_data["label"] == "S8-1"]
-    s81_rot = s81_spec["rotation"].values[0]
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
-    after_rot = []
-    if station_name == "S8-1":
-        after_rot = np.loadtxt("./s8-1.txt", delimiter=",")[:, 0:2]
-        station_rot = 251.3
-    else:
-        station_spec = low_array_data[low_array_data["label"] == station_name]
-        station_rot = station_spec["rotation"].values[0]
 
-        # Calculate rotation angle relative to s8-1 rotation
-        # NOTE: Rotation angles given in degrees East of North (clockwise)
-        rot_angle_deg = s81_rot - station_rot
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)
+    def _rotate_all(angles: np.ndarray, pts: np.ndarray, out: np.ndarray) -> None:
+        # Fill out[n] with pts rotated by angles[n], one station per thread
+        for n in prange(angles.shape[0]):
+            c = np.cos(angles[n])
+            s = np.sin(angles[n])
+            for k in range(pts.shape[0]):
+                x = pts[k, 0]
+                y = pts[k, 1]
+                out[n, k, 0] = c * x - s * y
+                out[n, k, 1] = s * x + c * y
+
+
+def apply_rotation(
+    station_rots: np.ndarray, before_rot: np.ndarray, s81_rot: float
+) -> np.ndarray:
+    # Calculate rotation angle of every station relative to s8-1 rotation
+    # NOTE: Rotation angles given in degrees East of North (clockwise)
+    rot_angles_deg = s81_rot - station_rots
+
+    # Convert to radians
+    rot_angles = np.asarray(rot_angles_deg * np.pi / 180.0, dtype=np.float64)
+
+    if HAS_NUMBA:
+        after_rot = np.empty((rot_angles.shape[0], before_rot.shape[0], 2))
+        _rotate_all(rot_angles, np.ascontiguousarray(before_rot), after_rot)
+        return after_rot
+
+    # A 2D rotation of (x, y) is the complex product (x + iy) * exp(i * angle),
+    # so rotate the s8-1 antennas for all stations at once, shape (N, n_ant)
+    before_rot_c = before_rot[:, 0] + 1j * before_rot[:, 1]
+    phase = np.exp(1j * rot_angles)
+    rotated = before_rot_c[None, :] * phase[:, None]
+
+    # Back to (N, n_ant, 2) x/y coordinates
+    after_rot = np.stack([rotated.real, rotated.imag], axis=-1)
+
+    return after_rot
+
 
-        # Convert to radians
-        rot_angle = rot_angle_deg * np.pi / 180.0
+def lookup_rotations(
+    sorted_labels: np.ndarray, sorted_rots: np.ndarray, station_names: np.ndarray
+) -> np.ndarray:
+    # Gather the rotation of every station in one vectorised pass
+    idx = np.searchsorted(sorted_labels, station_names)
+    idx = np.minimum(idx, sorted_labels.shape[0] - 1)
 
-        rot_mat = np.array(
-            [
-                [np.cos(rot_angle), -np.sin(rot_angle)],
-                [np.sin(rot_angle), np.cos(rot_angle)],
-            ]
-        )
+    missing = sorted_labels[idx] != station_names
+    if np.any(missing):
+        raise KeyError(f"No rotation found for stations: {station_names[missing]}")
 
-        # Coordinates of the antennas before rotation
-        before_rot = np.loadtxt("./s8-1.txt", delimiter=",")[:, 0:2]
+    return sorted_rots[idx]
 
-        after_rot = np.dot(before_rot, rot_mat.T)
 
-    return after_rot, station_rot
+def format_layout(ant_coords: np.ndarray) -> str:
+    # Format and join the x and y columns into "x, y" rows without a Python loop
+    x_strs = np.char.mod("%.5f", ant_coords[:, 0])
+    y_strs = np.char.mod("%.5f", ant_coords[:, 1])
+    rows = np.char.add(np.char.add(x_strs, ", "), y_strs)
+    return "\n".join(rows) + "\n"
+
+
+def write_station(
+    station_dir: Path, ant_coords: np.ndarray, euler_angle: float | None
+) -> None:
+    station_dir.mkdir()
+
+    # Save antenna coordinates
+    (station_dir / "layout.txt").write_text(format_layout(ant_coords))
+
+    # Save rotation to antennas, the same angle for every antenna in the station
+    if euler_angle is not None:
+        feed_str = f"{euler_angle:.5f}\n" * len(ant_coords)
+        (station_dir / "feed_angle.txt").write_text(feed_str)
 
 
 def input_arguments() -> argparse.Namespace:
@@ -78,6 +130,24 @@ def main():
     args = input_arguments()
     # Load this file for the rotation information for each station
     low_array_file = "./low_array_coords.dat"
+    labels = []
+    rotations = []
+    with open(low_array_file) as f:
+        # Skip the comment block before the column header
+        for _ in range(21):
+            next(f)
+        for row in csv.DictReader(f):
+            labels.append(row["label"])
+            rotations.append(float(row["rotation"]))
+
+    # Sort the labels once so station rotations can be gathered with searchsorted
+    sort_idx = np.argsort(labels)
+    sorted_labels = np.array(labels)[sort_idx]
+    sorted_rots = np.array(rotations)[sort_idx]
+    s81_rot = lookup_rotations(sorted_labels, sorted_rots, np.array(["S8-1"]))[0]
+
+    # Coordinates of the antennas before rotation
+    before_rot = np.loadtxt("./s8-1.txt", delimiter=",", usecols=(0, 1))
 
     # Create output directory
     telescope_str = args.telescope_str
@@ -89,58 +159,65 @@ def main():
     else:
         output_dir = f"telescope_model_{telescope_str}"
 
-    if Path(output_dir).exists() and Path(output_dir).is_dir():
+    output_dir = Path(output_dir)
+    if output_dir.exists() and output_dir.is_dir():
         shutil.rmtree(output_dir)
 
-    Path.mkdir(Path(output_dir))
+    output_dir.mkdir()
 
     # Select SKA-Low telescope subarray
     if telescope_str == "AAstar":
         telescope_str = "AA*"
     telescope = LowSubArray(subarray_type=telescope_str)
+    xyz = np.asarray(telescope.array_config.xyz.data)
+    station_names = np.asarray(telescope.array_config.names.data)
 
     # Save telescope centre in WGS84 coordinates into "position.txt"
     coordinates = telescope.array_config.location.to_geodetic(ellipsoid="WGS84")
-    with open(f"{output_dir}/position.txt", "x") as f:
+    with open(output_dir / "position.txt", "x") as f:
         f.write(f"{coordinates.lon.degree}, {coordinates.lat.degree}")
 
     # Save telescope station coordinates into "layout.txt"
     # NOTE: Some code borrowed from the ska_ost_array_config project
-    n_stations = telescope.array_config.names.data.shape[0]
-    with open(f"{output_dir}/layout.txt", "x") as f:
+    n_stations = station_names.shape[0]
+    np.savetxt(output_dir / "layout.txt", xyz[:, [1, 0, 2]], fmt="%s", delimiter=", ")
+
+    # Apply rotation relative to s8-1 for every station, rotations are angles EAST OF NORTH
+    # but the "Feed Element Rotation" setting in OKSAR expects counter-clockwise angles from the positive x-axis (I'm pretty sure)
+    if args.no_rot:  # Do not apply rotation, every station starts off at S8-1
+        all_rot = np.broadcast_to(before_rot, (n_stations, *before_rot.shape))
+    else:
+        station_rots = lookup_rotations(sorted_labels, sorted_rots, station_names)
+        all_rot = apply_rotation(station_rots, before_rot, s81_rot)
+        euler_angles = np.mod(90.0 - station_rots, 360.0)
+
+    # Go through each station and save antenna coordinates, the writes are
+    # filesystem bound so spread them over a thread pool
+    write_feed = not (args.no_rot or args.no_feed_rot)
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
         for i in range(n_stations):
-            f.write(
-                f"{telescope.array_config.xyz.data[i][1]}, {telescope.array_config.xyz.data[i][0]}, {telescope.array_config.xyz.data[i][2]}\n"
+            # Get name of station
+            station_name = station_names[i]
+            print(f"{i} {station_name}")
+
+            euler_angle = euler_angles[i] if write_feed else None
+
+            # euler_angle = 45 # Test feed angle, output beam should be have sidelobes at 45/135 degrees
+
+            futures.append(
+                executor.submit(
+                    write_station,
+                    output_dir / f"station{i:03d}",
+                    all_rot[i],
+                    euler_angle,
+                )
             )
 
-    # Go through each station and apply correct rotation then save antenna coordinates
-    for i in range(n_stations):
-        Path.mkdir(Path(f"{output_dir}/station{i:03d}"))
-
-        # Get name of station
-        station_name = telescope.array_config.names.data[i]
-        print(f"{i} {station_name}")
-
-        # Apply rotation relative to s8-1, returned rotation is angles EAST OF NORTH
-        # but the "Feed Element Rotation" setting in OKSAR expects counter-clockwise angles from the positive x-axis (I'm pretty sure)
-        if args.no_rot:  # Do not apply rotation, therefore pass in S8-1 since every station starts off at S8-1
-            ant_coords, rotation = apply_rotation(low_array_file, "S8-1")
-        else:
-            ant_coords, rotation = apply_rotation(low_array_file, station_name)
-            euler_angle = (90 - rotation) % 360
-
-        # euler_angle = 45 # Test feed angle, output beam should be have sidelobes at 45/135 degrees
-
-        # Save antenna coordinates
-        with open(f"{output_dir}/station{i:03d}/layout.txt", "x") as f:
-            for row in ant_coords:
-                f.write(f"{row[0]:.5f}, {row[1]:.5f}\n")
-
-        # Save rotation to antennas
-        if not (args.no_rot or args.no_feed_rot):
-            with open(f"{output_dir}/station{i:03d}/feed_angle.txt", "x") as f:
-                for i, _ in enumerate(ant_coords):
-                    f.write(f"{euler_angle:.5f}\n")
+        # Re-raise any error from the writers
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
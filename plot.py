@@ -1,7 +1,16 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+
+
+def load_coords(path):
+    """Load a comma separated file of antenna coordinates into an array."""
+    return pd.read_csv(
+        path, header=None, dtype=np.float64, skipinitialspace=True
+    ).values
 
 
 def plot_station_samples(
@@ -19,9 +28,16 @@ def plot_station_samples(
     """
     # Read substation coordinates
     substation_file = os.path.join(root_dir, "layout.txt")
-    subdirs = [
-        d for d in os.listdir(root_dir) if os.path.isdir(os.path.join(root_dir, d))
-    ]
+    # List every station directory and its .txt files once
+    station_files = {}
+    with os.scandir(root_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                with os.scandir(entry.path) as files:
+                    station_files[entry.name] = [
+                        f.name for f in files if f.name.endswith(".txt")
+                    ]
+    subdirs = list(station_files)
 
     # Read all substation coordinates at once
     substation_coords = np.loadtxt(substation_file, delimiter=",")
@@ -36,16 +52,10 @@ def plot_station_samples(
     reference_data = None
     if reference_station and reference_station in station_to_coords:
         ref_file = os.path.join(
-            root_dir,
-            reference_station,
-            [
-                f
-                for f in os.listdir(os.path.join(root_dir, reference_station))
-                if f.endswith(".txt")
-            ][0],
+            root_dir, reference_station, station_files[reference_station][0]
         )
         try:
-            reference_data = np.loadtxt(ref_file, delimiter=",")
+            reference_data = load_coords(ref_file)
         except Exception as e:
             print(f"Error loading reference station {reference_station}: {e}")
 
@@ -62,9 +72,10 @@ def plot_station_samples(
     remaining_slots = num_stations - len(stations_to_plot)
     if remaining_slots > 0:
         # Filter out reference and already included stations
-        available_stations = [
-            s for s in subdirs if s not in stations_to_plot and s != reference_station
-        ]
+        exclude = set(stations_to_plot)
+        if reference_station:
+            exclude.add(reference_station)
+        available_stations = [s for s in subdirs if s not in exclude]
         # Select at regular intervals
         selected_indices = np.linspace(
             0, len(available_stations) - 1, remaining_slots, dtype=int
@@ -81,6 +92,19 @@ def plot_station_samples(
         axes = np.array([axes])  # Handle single subplot case
     axes = axes.flatten()  # Flatten to make indexing easier
 
+    # Load antenna data for every selected station in parallel, errors are
+    # raised again when each future's result is taken below
+    with ThreadPoolExecutor() as executor:
+        antenna_loads = [
+            executor.submit(
+                load_coords,
+                os.path.join(root_dir, station_name, station_files[station_name][0]),
+            )
+            if station_files[station_name]
+            else None
+            for station_name in stations_to_plot[: len(axes)]
+        ]
+
     # For each selected station
     for plot_idx, station_name in enumerate(stations_to_plot):
         if plot_idx < len(axes):
@@ -89,16 +113,10 @@ def plot_station_samples(
             # Get station info
             station_x, station_y, _ = station_to_coords[station_name]
 
-            # Read antenna data
-            antenna_dir = os.path.join(root_dir, station_name)
-            antenna_files = [f for f in os.listdir(antenna_dir) if f.endswith(".txt")]
-
-            if antenna_files:
-                antenna_file_path = os.path.join(antenna_dir, antenna_files[0])
-
+            if antenna_loads[plot_idx] is not None:
                 try:
-                    # Load antenna coordinates
-                    antenna_coords = np.loadtxt(antenna_file_path, delimiter=",")
+                    # Get the loaded antenna coordinates
+                    antenna_coords = antenna_loads[plot_idx].result()
 
                     # Plot the station in the center
                     ax.scatter(0, 0, color="blue", s=100, marker="s", label="Station")